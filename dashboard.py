@@ -1,9 +1,20 @@
 # dashboard.py
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import re
+import hashlib
+import os
+import uuid
+import ahocorasick
 from pathlib import Path
+from tsdownsample import MinMaxLTTBDownsampler
+
+# Filtered frames share buffers with df until written to (always on from pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 st.set_page_config(page_title="ROSA Finance", layout="wide", page_icon="money_with_wings")
 st.title("ROSA Financial Dashboard")
@@ -15,15 +26,45 @@ if not csv_path.exists():
     st.error(f"CSV not found at:\n{csv_path}")
     st.stop()
 
+# Line charts are downsampled to this many points before being sent to the browser
+MAX_CHART_POINTS = 3000
+
+# Rows per page in the All Transactions table
+TABLE_PAGE_SIZE = 500
+
+# Bump whenever load_data's output changes so stale Parquet caches are rebuilt
+CACHE_VERSION = 3
+
 @st.cache_data
 def load_data():
+    # Reuse the cleaned frame from a previous run while the CSV is unchanged
+    stat = csv_path.stat()
+    key = hashlib.sha1(f"{CACHE_VERSION}-{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()[:12]
+    parquet_path = csv_path.with_name(f"{csv_path.stem}.{key}.parquet")
+    if parquet_path.exists():
+        try:
+            return pd.read_parquet(parquet_path)
+        except Exception:
+            # Unreadable cache (e.g. truncated): drop it and rebuild from the CSV
+            parquet_path.unlink(missing_ok=True)
+
     df = pd.read_csv(csv_path)
     df['date'] = pd.to_datetime(df['date'], errors='coerce')
     df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
     df = df.dropna(subset=['date', 'amount'])
+    # float32 halves the bytes every filter and sum has to stream. That is exact
+    # to the cent below ~$100k per transaction; running totals are accumulated in
+    # float64 below. Cast back to float64 here if audit-grade totals are needed.
+    df['amount'] = df['amount'].astype('float32')
 
-    df['clean_desc'] = df['description'].astype(str).str.lower()
-    df['clean_desc'] = df['clean_desc'].str.replace(r'[\W_]+', ' ', regex=True).str.strip()
+    # Arrow-backed strings run lower/replace/strip as vectorized UTF-8 kernels.
+    # The class is spelled for RE2: Unicode letters and digits, as [\W_] meant.
+    df['clean_desc'] = (
+        df['description'].astype(str).astype('string[pyarrow]')
+        .str.lower()
+        .str.replace(r'[^\p{L}\p{N}]+', ' ', regex=True)
+        .str.strip()
+    )
 
     categories = {
         'Groceries': ['tesco','sainsbury','aldi','lidl','asda','morrisons','waitrose','food','supermarket'],
@@ -36,15 +77,95 @@ def load_data():
         'Travel': ['ryanair','easyjet','booking.com','hotel','eurostar'],
     }
 
-    df['Category'] = 'Other'
-    for cat, keywords in categories.items():
-        pattern = '|'.join(keywords)
-        df.loc[df['clean_desc'].str.contains(pattern, case=False, na=False), 'Category'] = cat
+    # Keywords are cleaned like the descriptions, and each maps to its category's
+    # rank so the last matching category wins, as it always has. No match is -1.
+    automaton = ahocorasick.Automaton()
+    words = []
+    for rank, keywords in enumerate(categories.values()):
+        for kw in keywords:
+            word = re.sub(r'[\W_]+', ' ', kw)
+            automaton.add_word(word, rank)
+            words.append(word)
+    automaton.make_automaton()
+
+    # One Arrow (RE2) pass finds the rows that mention any keyword; only those go
+    # through the Python-level automaton to resolve which category wins.
+    has_keyword = df['clean_desc'].str.contains('|'.join(map(re.escape, words)), na=False).to_numpy()
+    ranks = np.full(len(df), -1)
+    ranks[has_keyword] = [max(rank for _, rank in automaton.iter(desc))
+                          for desc in df['clean_desc'][has_keyword]]
+    df['Category'] = np.array([*categories, 'Other'])[ranks]
 
     # Signed amount: credits positive, debits negative
-    df['signed_amount'] = df.apply(lambda x: -x['amount'] if x['type'] == 'debit' else x['amount'], axis=1)
+    amount = df['amount'].to_numpy()
+    df['signed_amount'] = np.where(df['type'].to_numpy() == 'debit', -amount, amount)
+
+    df = df.sort_values('date').reset_index(drop=True)
+
+    # Few distinct values each: categorical codes make the repeated filters cheap
+    df['type'] = df['type'].astype('category')
+    df['Category'] = df['Category'].astype('category')
+    assert df['type'].cat.codes.dtype == np.int8
 
-    return df.sort_values('date').reset_index(drop=True)
+    # Write to a temp file and rename, so a crash or a concurrent cold start never
+    # leaves a partial file under the real name. Caching is best effort only.
+    try:
+        for stale in csv_path.parent.glob(f"{csv_path.stem}.*.parquet"):
+            stale.unlink(missing_ok=True)
+        tmp_path = parquet_path.with_name(f"{parquet_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            df.to_parquet(tmp_path, compression='zstd')
+            os.replace(tmp_path, parquet_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    except OSError:
+        pass
+    return df
+
+@st.cache_data
+def load_daily_totals():
+    # Signed totals per calendar day (rows) and transaction type (columns), computed once
+    df = load_data()
+    days = df['date'].dt.floor('D').rename('day')
+    signed = df['signed_amount'].astype('float64')
+    return signed.groupby([days, df['type']], observed=True).sum().unstack('type')
+
+def category_totals(frame, mask):
+    # Sum amounts per category for the masked rows straight off the categorical codes
+    categories = frame['Category'].cat.categories
+    codes = frame['Category'].cat.codes.to_numpy()[mask]
+    sums = np.bincount(codes, weights=frame['amount'].to_numpy()[mask], minlength=len(categories))
+    seen = np.bincount(codes, minlength=len(categories)) > 0
+    return pd.Series(
+        sums[seen], index=pd.Index(categories[seen], name='Category'), name='amount'
+    ).sort_values(ascending=True)
+
+def downsample(x, y, n_out=MAX_CHART_POINTS):
+    # LTTB keeps the peaks and valleys while capping the number of plotted points
+    if len(x) <= n_out:
+        return x, y
+    idx = MinMaxLTTBDownsampler().downsample(x.astype('int64'), y, n_out=n_out)
+    return x[idx], y[idx]
+
+def net_worth_series(signed_amount, type_codes, lo, hi, allowed):
+    # Filter rows lo..hi by type, returning the kept row positions and the running
+    # net worth, which starts at zero on the first kept transaction. The appended
+    # False makes a missing type (code -1) never match.
+    rows = np.flatnonzero(np.append(allowed, False)[type_codes[lo:hi]]) + lo
+    cumulative = np.cumsum(signed_amount[rows], dtype=np.float64)
+    if len(cumulative) > 0:
+        cumulative -= cumulative[0]
+    return rows, cumulative
+
+@st.cache_resource
+def base_layout(height=400):
+    # Layout shared by the Overview line and bar charts; treat the result as read-only
+    return dict(
+        height=height,
+        margin=dict(t=40, l=10, r=10, b=10),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
 
 df = load_data()
 st.success(f"Loaded {len(df):,} transactions")
@@ -59,25 +180,46 @@ with st.sidebar:
         min_value=df['date'].min().date(),
         max_value=df['date'].max().date()
     )
+    chart_points = st.slider(
+        "Chart Detail (points)", min_value=500, max_value=20000,
+        value=MAX_CHART_POINTS, step=500
+    )
 
 # ==================== APPLY FILTERS ====================
-filtered = df[
-    df['type'].isin(types) &
-    (df['date'].dt.date >= date_range[0]) &
-    (df['date'].dt.date <= date_range[1])
-].copy()
+# df is date-sorted, so the date range is a contiguous slice found by binary search
+dates = df['date'].to_numpy()
+lo = np.searchsorted(dates, np.datetime64(date_range[0]), side='left')
+hi = np.searchsorted(dates, np.datetime64(date_range[1]) + np.timedelta64(1, 'D'), side='left')
 
-# CRITICAL: Sort by date and recalculate cumulative net worth on filtered data only
-filtered = filtered.sort_values('date').reset_index(drop=True)
-filtered['cumulative'] = filtered['signed_amount'].cumsum()
+# CRITICAL: Recalculate cumulative net worth on filtered data only. The type filter
+# and the running total share one pass; filtered reuses the kept rows, which are
+# still in date order, so no re-sort is needed.
+kept_rows, nw_values = net_worth_series(
+    df['signed_amount'].to_numpy(),
+    df['type'].cat.codes.to_numpy(),
+    lo, hi,
+    df['type'].cat.categories.isin(types),
+)
+filtered = df.take(kept_rows).reset_index(drop=True)
+nw_dates = dates[kept_rows]
 
-# Optional: Make net worth start at zero (cleaner visual)
-if len(filtered) > 0:
-    filtered['cumulative'] = filtered['cumulative'] - filtered['cumulative'].iloc[0]
+# Daily and monthly cash flow come from the cached per-day totals, not from filtered
+daily = (
+    load_daily_totals()
+    .loc[pd.Timestamp(date_range[0]):pd.Timestamp(date_range[1])]
+    .reindex(columns=types)
+    .sum(axis=1, min_count=1)
+    .dropna()
+)
+monthly = daily.resample('MS').sum()
 
 # ==================== METRICS ====================
-income = filtered[filtered['type'] == 'credit']['amount'].sum()
-expense = filtered[filtered['type'] == 'debit']['amount'].sum()
+# Type masks are built once (categorical code compares) and reused by the tabs
+is_credit = (filtered['type'] == 'credit').to_numpy()
+is_debit = (filtered['type'] == 'debit').to_numpy()
+amounts = filtered['amount'].to_numpy()
+income = amounts[is_credit].sum(dtype=np.float64)
+expense = amounts[is_debit].sum(dtype=np.float64)
 net = income - expense
 
 col1, col2, col3, col4 = st.columns(4)
@@ -95,10 +237,11 @@ with tab1:
 
     with a1:
         st.subheader("Net Worth over Time")
+        nw_x, nw_y = downsample(nw_dates, nw_values, chart_points)
         fig_nw = go.Figure()
         fig_nw.add_trace(go.Scatter(
-            x=filtered['date'],
-            y=filtered['cumulative'],
+            x=nw_x,
+            y=nw_y,
             line=dict(color="#4ecdc4", width=4),
             fill='tozeroy',
             fillcolor="rgba(78, 205, 196, 0.3)",
@@ -106,10 +249,7 @@ with tab1:
             name="Net Worth"
         ))
         fig_nw.update_layout(
-            height=400,
-            margin=dict(t=40, l=10, r=10, b=10),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
+            **base_layout(),
             xaxis=dict(showgrid=False),
             yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title=None),
             hovermode="x unified"
@@ -118,19 +258,16 @@ with tab1:
 
     with a2:
         st.subheader("Monthly Cash Flow")
-        monthly = filtered.set_index('date').resample('MS')['signed_amount'].sum().reset_index()
+        monthly_vals = monthly.to_numpy()
         fig_monthly = go.Figure(go.Bar(
-            x=monthly['date'],
-            y=monthly['signed_amount'],
-            marker_color=monthly['signed_amount'].apply(lambda x: '#4ecdc4' if x >= 0 else '#ff6b6b'),
-            text=monthly['signed_amount'].apply(lambda x: f"${x:,.0f}"),
+            x=monthly.index,
+            y=monthly_vals,
+            marker_color=np.where(monthly_vals >= 0, '#4ecdc4', '#ff6b6b'),
+            text=[f"${x:,.0f}" for x in monthly_vals],
             textposition="outside"
         ))
         fig_monthly.update_layout(
-            height=400,
-            margin=dict(t=40, l=10, r=10, b=10),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
+            **base_layout(),
             xaxis_tickangle=45,
             yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
             hovermode="x"
@@ -143,6 +280,7 @@ with tab1:
         st.subheader("By Transaction Type")
         pie_data = filtered['type'].value_counts().reset_index()
         pie_data.columns = ['type', 'count']
+        pie_data = pie_data[pie_data['count'] > 0]
         pie_data['type'] = pie_data['type'].str.capitalize()
 
         fig_pie = px.pie(
@@ -162,10 +300,10 @@ with tab1:
 
     with b2:
         st.subheader("Daily Cash Flow")
-        daily = filtered.groupby('date')['signed_amount'].sum().reset_index()
+        daily_x, daily_y = downsample(daily.index.to_numpy(), daily.to_numpy(), chart_points)
         fig_wave = go.Figure(go.Scatter(
-            x=daily['date'],
-            y=daily['signed_amount'],
+            x=daily_x,
+            y=daily_y,
             fill='tozeroy',
             mode='lines',
             line=dict(color="#4ecdc4", width=2),
@@ -173,10 +311,7 @@ with tab1:
         ))
         fig_wave.add_hline(y=0, line_color="rgba(255,255,255,0.15)", line_width=1)
         fig_wave.update_layout(
-            height=400,
-            margin=dict(t=40, l=10, r=10, b=10),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
+            **base_layout(),
             xaxis=dict(showgrid=False),
             yaxis=dict(showgrid=False, title=None),
             hovermode="x unified"
@@ -186,7 +321,7 @@ with tab1:
 # ==================== CATEGORIES TAB ====================
 with tab2:
     st.subheader("Spending Breakdown (Debits Only)")
-    spending = filtered[filtered['type'] == 'debit'].groupby('Category')['amount'].sum().sort_values(ascending=True)
+    spending = category_totals(filtered, is_debit)
     if not spending.empty:
         fig_expense = px.bar(
             spending,
@@ -204,7 +339,7 @@ with tab2:
         st.info("No debit transactions in selected range.")
 
     st.subheader("Income Sources (Credits Only)")
-    income_cat = filtered[filtered['type'] == 'credit'].groupby('Category')['amount'].sum().sort_values(ascending=True)
+    income_cat = category_totals(filtered, is_credit)
     if not income_cat.empty:
         fig_income = px.bar(
             income_cat,
@@ -223,12 +358,22 @@ with tab2:
 
 # ==================== ALL TRANSACTIONS TAB ====================
 with tab3:
-    display_df = filtered[['date', 'amount', 'type', 'Category', 'description']].copy()
+    # filtered is already in datetime order, so reversing it gives newest first
+    # without re-sorting the formatted date strings. Only the visible page is
+    # formatted and sent to the browser.
+    n_pages = max(1, -(-len(filtered) // TABLE_PAGE_SIZE))
+    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1)
+    start = (page - 1) * TABLE_PAGE_SIZE
+    page_rows = filtered.iloc[::-1].iloc[start:start + TABLE_PAGE_SIZE]
+    st.caption(f"Showing {start + 1 if len(page_rows) else 0:,}–{start + len(page_rows):,} of {len(filtered):,} transactions")
+
+    display_df = page_rows[['date', 'amount', 'type', 'Category', 'description']]
     display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')
-    display_df['amount'] = display_df['amount'].apply(lambda x: f"${x:,.2f}")
+    display_df['amount'] = display_df['amount'].map('${:,.2f}'.format)
     display_df['type'] = display_df['type'].str.capitalize()
-    display_df = display_df.sort_values('date', ascending=False)
     st.dataframe(display_df, use_container_width=True, height=700)
 
-# Final touch
-st.balloons()
\ No newline at end of file
+# Final touch, on the first render of a session only
+if 'loaded_once' not in st.session_state:
+    st.balloons()
+    st.session_state['loaded_once'] = True